@@ -173,7 +173,7 @@ class KSession():
         with self._context:
             self._model = Model(*function())
 
-    def load_model_weights(self) -> None:
+    def load_model_weights(self, by_name: bool = False) -> None:
         """ Load model weights for a defined model inside the correct session.
 
         This method is a wrapper for :class:`keras.load_weights()`. Once a model has been defined
@@ -182,11 +182,18 @@ class KSession():
 
         For Tensorflow backends, the `make_predict_function` method is called on the model to make
         it thread safe.
+
+        Parameters
+        ----------
+        by_name: bool, optional
+            ``True`` to load weights into layers by their names rather than by the topological
+            order the weights were saved in. Required when the defined model's layer ordering
+            differs from the model the weights file was saved from. Default: ``False``
         """
         logger.verbose("Initializing plugin model: %s", self._name)  # type:ignore
         assert self._model is not None
         with self._context:
-            self._model.load_weights(self._model_path)
+            self._model.load_weights(self._model_path, by_name=by_name)
             self._model.make_predict_function()
 
     def append_softmax_activation(self, layer_index: int = -1) -> None:
@@ -38,6 +38,16 @@ if T.TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+_VRAM_ERROR_MESSAGE = (
+    "You do not have enough GPU memory available to run detection at the selected batch size. "
+    "You can try a number of things:"
+    "\n1) Close any other application that is using your GPU (web browsers are particularly bad "
+    "for this)."
+    "\n2) Lower the batchsize (the amount of images fed into the model) by editing the plugin "
+    "settings (GUI: Settings > Configure extract settings, CLI: Edit the file "
+    "faceswap/config/extract.ini)."
+    "\n3) Enable 'Single Process' mode.")
+
 
 @dataclass
 class DetectorBatch(ExtractorBatch):
@@ -274,6 +284,35 @@ class Detector(Extractor):  # pylint:disable=abstract-method
         """ Wrap models predict function in rotations """
         assert isinstance(batch, DetectorBatch)
         batch.rotation_matrix = [np.array([]) for _ in range(len(batch.feed))]
+        if self.rotation == [0]:
+            # No rotations requested, so skip the rotation bookkeeping (including the copy of
+            # the initial feed) and pass the predictions straight through. This also allows
+            # plugins to return their raw model output here and defer CPU post-processing to
+            # their output thread, overlapping it with the next batch's GPU inference
+            try:
+                batch.prediction = self.predict(batch.feed)
+            except tf_errors.ResourceExhaustedError as err:
+                raise FaceswapError(_VRAM_ERROR_MESSAGE) from err
+            logger.trace("detect_prediction output: (filenames: %s, "  # type:ignore[attr-defined]
+                         "prediction: %s)",
+                         batch.filename, batch.prediction)
+            return batch
+        return self._predict_rotations(batch)
+
+    def _predict_rotations(self, batch: DetectorBatch) -> DetectorBatch:
+        """ Run the model's predict function for each requested rotation angle, merging faces
+        found at earlier angles into the final predictions.
+
+        Parameters
+        ----------
+        batch: :class:`DetectorBatch`
+            The batch to run through the model
+
+        Returns
+        -------
+        :class:`DetectorBatch`
+            The batch with the predictions populated
+        """
         found_faces: list[np.ndarray] = [np.array([]) for _ in range(len(batch.feed))]
         for angle in self.rotation:
             # Rotate the batch and insert placeholders for already found faces
@@ -307,15 +346,7 @@ class Detector(Extractor):  # pylint:disable=abstract-method
                              "prediction: %s",
                              angle, batch.filename, pred)
             except tf_errors.ResourceExhaustedError as err:
-                msg = ("You do not have enough GPU memory available to run detection at the "
-                       "selected batch size. You can try a number of things:"
-                       "\n1) Close any other application that is using your GPU (web browsers are "
-                       "particularly bad for this)."
-                       "\n2) Lower the batchsize (the amount of images fed into the model) by "
-                       "editing the plugin settings (GUI: Settings > Configure extract settings, "
-                       "CLI: Edit the file faceswap/config/extract.ini)."
-                       "\n3) Enable 'Single Process' mode.")
-                raise FaceswapError(msg) from err
+                raise FaceswapError(_VRAM_ERROR_MESSAGE) from err
 
             if angle != 0 and any(face.any() for face in batch.prediction):
                 logger.verbose("found face(s) by rotating image %s "  # type:ignore[attr-defined]
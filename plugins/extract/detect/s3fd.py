@@ -9,18 +9,24 @@ from __future__ import annotations
 import logging
 import typing as T
 
-from scipy.special import logsumexp
 import numpy as np
+import tensorflow as tf
 
 # Ignore linting errors from Tensorflow's thoroughly broken import system
 from tensorflow import keras
 from tensorflow.keras import backend as K  # pylint:disable=import-error
 from tensorflow.keras.layers import (  # pylint:disable=import-error
-    Concatenate, Conv2D, Input, Maximum, MaxPooling2D, ZeroPadding2D)
+    Conv2D, Input, MaxPooling2D, ZeroPadding2D)
 
 from lib.model.session import KSession
 from ._base import BatchType, Detector
 
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
 if T.TYPE_CHECKING:
     from tensorflow import Tensor
 
@@ -44,28 +50,53 @@ class Detect(Detector):
         """ Initialize S3FD Model"""
         assert isinstance(self.model_path, str)
         confidence = self.config["confidence"] / 100
-        model_kwargs = {"custom_objects": {"L2Norm": L2Norm, "SliceO2K": SliceO2K}}
+        model_kwargs = {"custom_objects": {"L2Norm": L2Norm,
+                                           "SliceO2K": SliceO2K,
+                                           "MaxOutBG": MaxOutBG}}
         self.model = S3fd(self.model_path,
                           model_kwargs,
                           self.config["allow_growth"],
                           self._exclude_gpus,
-                          confidence)
+                          confidence,
+                          self.config["precision"])
 
     def process_input(self, batch: BatchType) -> None:
-        """ Compile the detection image(s) for prediction """
-        assert isinstance(self.model, S3fd)
-        batch.feed = self.model.prepare_batch(np.array(batch.image))
+        """ Compile the detection image(s) for prediction
 
-    def predict(self, feed: np.ndarray) -> np.ndarray:
-        """ Run model to get predictions """
+        The images are copied straight into a float32 feed buffer, which the mean subtraction
+        then updates in place, rather than staging the batch through an intermediate uint8 array
+        and allocating a second full-size output for the normalization.
+        """
+        assert isinstance(self.model, S3fd)
+        feed = np.empty((len(batch.image), self.input_size, self.input_size, 3),
+                        dtype="float32")
+        for idx, image in enumerate(batch.image):
+            feed[idx] = image
+        batch.feed = self.model.prepare_batch(feed)
+
+    def predict(self, feed: np.ndarray) -> np.ndarray | list[np.ndarray]:
+        """ Run model to get predictions
+
+        When no rotations are requested the raw model output is passed through and finalized in
+        :func:`process_output` instead, so that the numpy post-processing of one batch runs in
+        the output thread while the next batch occupies the GPU. With rotations enabled each
+        pass needs per-image boxes to decide whether to rotate again, so the predictions are
+        finalized here.
+        """
         assert isinstance(self.model, S3fd)
         predictions = self.model.predict(feed)
         assert isinstance(predictions, list)
-        return self.model.finalize_predictions(predictions)
+        if len(self.rotation) > 1:
+            return self.model.finalize_predictions(predictions)
+        return predictions
 
     def process_output(self, batch) -> None:
         """ Compile found faces for output """
-        return
+        if len(self.rotation) > 1:
+            return  # predictions already finalized per rotation pass in predict()
+        assert isinstance(self.model, S3fd)
+        assert isinstance(batch.prediction, list)
+        batch.prediction = self.model.finalize_predictions(batch.prediction)
 
 
 ################################################################################
@@ -74,6 +105,10 @@ class Detect(Detector):
 class L2Norm(keras.layers.Layer):
     """ L2 Normalization layer for S3FD.
 
+    The learned per-channel scale is folded into the kernels of the convolutions that consume
+    this layer's output at weight load time (see :func:`S3fd._fold_l2norm_scales`), so at
+    inference time only the normalization itself is applied.
+
     Parameters
     ----------
     n_channels: int
@@ -104,8 +139,8 @@ class L2Norm(keras.layers.Layer):
         tensor:
             The output from the L2 Normalization Layer
         """
-        norm = K.sqrt(K.sum(K.pow(inputs, 2), axis=-1, keepdims=True)) + 1e-10
-        var_x = inputs / norm * self.w
+        norm_sq = K.sum(K.square(inputs), axis=-1, keepdims=True)
+        var_x = inputs * tf.math.rsqrt(norm_sq + 1e-10)
         return var_x
 
     def get_config(self) -> dict:
@@ -134,6 +169,12 @@ class SliceO2K(keras.layers.Layer):
         self._ends = ends
         self._axes = axes
         self._steps = steps
+        # Every usage in this model slices a single channel range on axis 3 with unit step, so
+        # fast-path that case to a basic slice and skip the per-call slice-map construction
+        self._fast_slice: tuple[int, int] | None = None
+        if self._axes == [3] and len(self._starts) == 1 and self._steps in (None, [1]):
+            self._fast_slice = (self._starts[0], self._ends[0])
+        self._slice_map: dict[int, slice] = {}
         super().__init__(**kwargs)
 
     def _get_slices(self, dimensions: int) -> list[tuple[int, ...]]:
@@ -154,6 +195,18 @@ class SliceO2K(keras.layers.Layer):
         assert len(axes) == len(steps) == len(self._starts) == len(self._ends)
         return list(zip(axes, self._starts, self._ends, steps))
 
+    def build(self, input_shape: tuple[int, ...]) -> None:
+        """ Cache the slice lookup for the input's dimensions. All calls share the same input
+        rank, so this only needs computing once.
+
+        Parameters
+        ----------
+        input_shape: tuple
+            Shape tuple (tuple of integers) for the input to the layer
+        """
+        self._slice_map = {x[0]: slice(*x[1:]) for x in self._get_slices(len(input_shape))}
+        super().build(input_shape)
+
     def compute_output_shape(self, input_shape: tuple[int, ...]) -> tuple[int, ...]:
         """Computes the output shape of the layer.
 
@@ -202,7 +255,10 @@ class SliceO2K(keras.layers.Layer):
         A tensor or list/tuple of tensors.
             The layer output
         """
-        ax_map = dict((x[0], slice(*x[1:])) for x in self._get_slices(K.ndim(inputs)))
+        if self._fast_slice is not None:
+            start, end = self._fast_slice
+            return inputs[..., start:end]
+        ax_map = self._slice_map
         shape = K.int_shape(inputs)
         slices = [(ax_map[a] if a in ax_map else slice(None)) for a in range(len(shape))]
         retval = inputs[tuple(slices)]
@@ -224,6 +280,108 @@ class SliceO2K(keras.layers.Layer):
         return config
 
 
+class MaxOutBG(keras.layers.Layer):
+    """ Max-out background label layer for S3FD.
+
+    Fuses the 4 slice, maximum and concatenate operations previously used for the max-out
+    background label of the `conv3_3` classification head into a single op, taking the maximum
+    of the first 3 (background) channels and concatenating the final (face) channel to it.
+    """
+    def call(self, inputs: Tensor) -> Tensor:  # pylint:disable=arguments-differ
+        """ Call the Max-out Background Layer.
+
+        Parameters
+        ----------
+        inputs: tensor
+            The 4 channel classification head to apply the max-out background label to
+
+        Returns
+        -------
+        tensor:
+            The 2 channel output from the Max-out Background Layer
+        """
+        return K.concatenate([K.max(inputs[..., :3], axis=-1, keepdims=True),
+                              inputs[..., 3:4]], axis=-1)
+
+    def compute_output_shape(self, input_shape: tuple[int, ...]) -> tuple[int, ...]:
+        """Computes the output shape of the layer.
+
+        Parameters
+        ----------
+        input_shape: tuple
+            Shape tuple (tuple of integers) for the input to the layer
+
+        Returns
+        -------
+        tuple
+            An output shape tuple.
+        """
+        return tuple(input_shape[:-1]) + (2, )
+
+
+def _nms_loop(boxes: np.ndarray, threshold: float) -> np.ndarray:
+    """ O(N) Non-Maximum Suppression loop, written with explicit loops so that it can be
+    compiled by Numba when it is available.
+
+    Avoids both the Python interpreter overhead of the original loop and the O(N^2) scratch
+    memory of the vectorized IoU matrix version.
+
+    Parameters
+    ----------
+    boxes: :class:`numpy.ndarray`
+        The (`candidates`, 5) bounding box and score array to suppress. Modified in place
+    threshold: float
+        The IoU threshold above which boxes are suppressed
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The retained bounding boxes
+    """
+    count = boxes.shape[0]
+    areas = (boxes[:, 2] - boxes[:, 0] + 1) * (boxes[:, 3] - boxes[:, 1] + 1)
+    order = np.argsort(boxes[:, 4])[::-1]
+    suppressed = np.zeros(count, dtype=np.bool_)
+    retained = np.empty(count, dtype=np.int64)
+    num_retained = 0
+    for pos in range(count):
+        best = order[pos]
+        if suppressed[best]:
+            continue
+        weights = 0.0
+        vote = np.zeros(4)
+        overlaps = 0
+        for pos2 in range(pos + 1, count):
+            other = order[pos2]
+            if suppressed[other]:
+                continue
+            width = (min(boxes[best, 2], boxes[other, 2])
+                     - max(boxes[best, 0], boxes[other, 0]) + 1)
+            height = (min(boxes[best, 3], boxes[other, 3])
+                      - max(boxes[best, 1], boxes[other, 1]) + 1)
+            if width <= 0 or height <= 0:
+                continue
+            intersection = width * height
+            iou = intersection / (areas[best] + areas[other] - intersection)
+            if iou > threshold:
+                suppressed[other] = True
+                score = boxes[other, 4]
+                weights += score
+                for coord in range(4):
+                    vote[coord] += boxes[other, coord] * score
+                overlaps += 1
+        if overlaps > 0:
+            for coord in range(4):
+                boxes[best, coord] = vote[coord] / weights
+        retained[num_retained] = best
+        num_retained += 1
+    return boxes[retained[:num_retained]]
+
+
+if _HAS_NUMBA:
+    _nms_loop = njit(cache=True, fastmath=True)(_nms_loop)
+
+
 class S3fd(KSession):
     """ Keras Network """
     def __init__(self,
@@ -231,21 +389,89 @@ class S3fd(KSession):
                  model_kwargs: dict,
                  allow_growth: bool,
                  exclude_gpus: list[int] | None,
-                 confidence: float) -> None:
+                 confidence: float,
+                 precision: str = "fp32") -> None:
         logger.debug("Initializing: %s: (model_path: '%s', model_kwargs: %s, allow_growth: %s, "
-                     "exclude_gpus: %s, confidence: %s)", self.__class__.__name__, model_path,
-                     model_kwargs, allow_growth, exclude_gpus, confidence)
+                     "exclude_gpus: %s, confidence: %s, precision: %s)",
+                     self.__class__.__name__, model_path, model_kwargs, allow_growth,
+                     exclude_gpus, confidence, precision)
         super().__init__("S3FD",
                          model_path,
                          model_kwargs=model_kwargs,
                          allow_growth=allow_growth,
                          exclude_gpus=exclude_gpus)
-        self.define_model(self.model_definition)
-        self.load_model_weights()
+        self._precision = precision
+        if precision == "fp16":
+            # Variables stay float32 under the mixed policy, so existing weight files still
+            # load. The policy is restored afterwards so other plugins are unaffected
+            previous_policy = keras.mixed_precision.global_policy()
+            keras.mixed_precision.set_global_policy("mixed_float16")
+        try:
+            self.define_model(self.model_definition)
+        finally:
+            if precision == "fp16":
+                keras.mixed_precision.set_global_policy(previous_policy)
+        # The fused max-out block and same-padded convolutions change the layer ordering from
+        # the graph the legacy weights file was saved from, so the positional h5 loader would
+        # mis-assign weights. All weighted layers keep their saved names, so load by name
+        self.load_model_weights(by_name=True)
+        self._fold_l2norm_scales()
         self.confidence = confidence
-        self.average_img = np.array([104.0, 117.0, 123.0])
+        # The softmax + threshold test on a 2 class head is equivalent to a single logit
+        # difference test: softmax(x)[1] >= t  <=>  x[1] - x[0] >= log(t / (1 - t))
+        clipped = min(max(confidence, 0.05), 1.0 - 1e-6)
+        self._logit_threshold = np.log(clipped / (1.0 - clipped))
+        self.average_img = np.array([104.0, 117.0, 123.0], dtype="float32")
+        self._priors = self._get_priors()
         logger.debug("Initialized: %s", self.__class__.__name__)
 
+    @staticmethod
+    def _get_priors() -> list[np.ndarray]:
+        """ Pre-compute the prior boxes for each scale.
+
+        The priors are fully determined by the fixed 640px input size and each scale's stride,
+        so the full (`height`, `width`, 4) grid of (`center_x`, `center_y`, `size`, `size`)
+        priors for each of the 6 scales can be built once and gathered from at detection time.
+
+        Returns
+        -------
+        list
+            The prior box grid for each scale
+        """
+        retval = []
+        for i in range(6):
+            stride = 2 ** (i + 2)    # 4,8,16,32,64,128
+            feature_size = 640 // stride
+            y_grid, x_grid = np.meshgrid(np.arange(feature_size),
+                                         np.arange(feature_size),
+                                         indexing="ij")
+            sizes = np.full(x_grid.shape, stride * 4)
+            retval.append(np.stack([stride / 2 + x_grid * stride,
+                                    stride / 2 + y_grid * stride,
+                                    sizes,
+                                    sizes], axis=-1).astype("float32"))
+        return retval
+
+    def _fold_l2norm_scales(self) -> None:
+        """ Fold the learned per-channel scale of each :class:`L2Norm` layer into the kernels of
+        the convolutions that consume its output.
+
+        Scaling the normalized tensor by `w` then convolving is identical to convolving with a
+        kernel that has been multiplied by `w` along its input-channel axis, so the multiply can
+        be removed from the per-image path and performed once here at weight load time.
+        """
+        consumers = {"conv3_3_norm": ("conv3_3_norm_mbox_conf", "conv3_3_norm_mbox_loc"),
+                     "conv4_3_norm": ("conv4_3_norm_mbox_conf", "conv4_3_norm_mbox_loc"),
+                     "conv5_3_norm": ("conv5_3_norm_mbox_conf", "conv5_3_norm_mbox_loc")}
+        assert self._model is not None
+        for norm_name, conv_names in consumers.items():
+            scale = self._model.get_layer(norm_name).get_weights()[0]
+            for conv_name in conv_names:
+                conv = self._model.get_layer(conv_name)
+                kernel, bias = conv.get_weights()
+                conv.set_weights([kernel * scale.reshape(1, 1, -1, 1), bias])
+        logger.debug("Folded L2Norm scales into: %s", sum(consumers.values(), ()))
+
     def model_definition(self) -> tuple[list[Tensor], list[Tensor]]:
         """ Keras S3FD Model Definition, adapted from FAN pytorch implementation. """
         input_ = Input(shape=(640, 640, 3))
@@ -275,48 +501,51 @@ class S3fd(KSession):
         f6_2 = self.conv_up(var_x, 256, 6)
         f7_2 = self.conv_up(f6_2, 128, 7)
 
-        f3_3 = L2Norm(256, scale=10, name="conv3_3_norm")(f3_3)
-        f4_3 = L2Norm(512, scale=8, name="conv4_3_norm")(f4_3)
-        f5_3 = L2Norm(512, scale=5, name="conv5_3_norm")(f5_3)
-
-        f3_3 = ZeroPadding2D(1)(f3_3)
-        cls1 = Conv2D(4, kernel_size=3, strides=1, name="conv3_3_norm_mbox_conf")(f3_3)
-        reg1 = Conv2D(4, kernel_size=3, strides=1, name="conv3_3_norm_mbox_loc")(f3_3)
-
-        f4_3 = ZeroPadding2D(1)(f4_3)
-        cls2 = Conv2D(2, kernel_size=3, strides=1, name="conv4_3_norm_mbox_conf")(f4_3)
-        reg2 = Conv2D(4, kernel_size=3, strides=1, name="conv4_3_norm_mbox_loc")(f4_3)
-
-        f5_3 = ZeroPadding2D(1)(f5_3)
-        cls3 = Conv2D(2, kernel_size=3, strides=1, name="conv5_3_norm_mbox_conf")(f5_3)
-        reg3 = Conv2D(4, kernel_size=3, strides=1, name="conv5_3_norm_mbox_loc")(f5_3)
-
-        ffc7 = ZeroPadding2D(1)(ffc7)
-        cls4 = Conv2D(2, kernel_size=3, strides=1, name="fc7_mbox_conf")(ffc7)
-        reg4 = Conv2D(4, kernel_size=3, strides=1, name="fc7_mbox_loc")(ffc7)
-
-        f6_2 = ZeroPadding2D(1)(f6_2)
-        cls5 = Conv2D(2, kernel_size=3, strides=1, name="conv6_2_mbox_conf")(f6_2)
-        reg5 = Conv2D(4, kernel_size=3, strides=1, name="conv6_2_mbox_loc")(f6_2)
-
-        f7_2 = ZeroPadding2D(1)(f7_2)
-        cls6 = Conv2D(2, kernel_size=3, strides=1, name="conv7_2_mbox_conf")(f7_2)
-        reg6 = Conv2D(4, kernel_size=3, strides=1, name="conv7_2_mbox_loc")(f7_2)
+        # Normalization is numerically sensitive, so it stays at full precision when the rest
+        # of the model is running at fp16
+        norm_dtype = "float32" if self._precision == "fp16" else None
+        f3_3 = L2Norm(256, scale=10, name="conv3_3_norm", dtype=norm_dtype)(f3_3)
+        f4_3 = L2Norm(512, scale=8, name="conv4_3_norm", dtype=norm_dtype)(f4_3)
+        f5_3 = L2Norm(512, scale=5, name="conv5_3_norm", dtype=norm_dtype)(f5_3)
+
+        cls1 = Conv2D(4, kernel_size=3, strides=1, padding="same",
+                      name="conv3_3_norm_mbox_conf")(f3_3)
+        reg1 = Conv2D(4, kernel_size=3, strides=1, padding="same",
+                      name="conv3_3_norm_mbox_loc")(f3_3)
+
+        cls2 = Conv2D(2, kernel_size=3, strides=1, padding="same",
+                      name="conv4_3_norm_mbox_conf")(f4_3)
+        reg2 = Conv2D(4, kernel_size=3, strides=1, padding="same",
+                      name="conv4_3_norm_mbox_loc")(f4_3)
+
+        cls3 = Conv2D(2, kernel_size=3, strides=1, padding="same",
+                      name="conv5_3_norm_mbox_conf")(f5_3)
+        reg3 = Conv2D(4, kernel_size=3, strides=1, padding="same",
+                      name="conv5_3_norm_mbox_loc")(f5_3)
+
+        cls4 = Conv2D(2, kernel_size=3, strides=1, padding="same",
+                      name="fc7_mbox_conf")(ffc7)
+        reg4 = Conv2D(4, kernel_size=3, strides=1, padding="same",
+                      name="fc7_mbox_loc")(ffc7)
+
+        cls5 = Conv2D(2, kernel_size=3, strides=1, padding="same",
+                      name="conv6_2_mbox_conf")(f6_2)
+        reg5 = Conv2D(4, kernel_size=3, strides=1, padding="same",
+                      name="conv6_2_mbox_loc")(f6_2)
+
+        cls6 = Conv2D(2, kernel_size=3, strides=1, padding="same",
+                      name="conv7_2_mbox_conf")(f7_2)
+        reg6 = Conv2D(4, kernel_size=3, strides=1, padding="same",
+                      name="conv7_2_mbox_loc")(f7_2)
 
         # max-out background label
-        chunks = [SliceO2K(starts=[0], ends=[1], axes=[3], steps=None)(cls1),
-                  SliceO2K(starts=[1], ends=[2], axes=[3], steps=None)(cls1),
-                  SliceO2K(starts=[2], ends=[3], axes=[3], steps=None)(cls1),
-                  SliceO2K(starts=[3], ends=[4], axes=[3], steps=None)(cls1)]
-
-        bmax = Maximum()([chunks[0], chunks[1], chunks[2]])
-        cls1 = Concatenate()([bmax, chunks[3]])
+        cls1 = MaxOutBG()(cls1)
 
         return [input_], [cls1, reg1, cls2, reg2, cls3, reg3, cls4, reg4, cls5, reg5, cls6, reg6]
 
     @classmethod
     def conv_block(cls, inputs: Tensor, filters: int, idx: int, recursions: int) -> Tensor:
-        """ First round convolutions with zero padding added.
+        """ First round convolutions with same padding.
 
         Parameters
         ----------
@@ -338,10 +567,10 @@ class S3fd(KSession):
         var_x = inputs
         for i in range(1, recursions + 1):
             rec_name = f"{name}_{i}"
-            var_x = ZeroPadding2D(1, name=f"{rec_name}.zeropad")(var_x)
             var_x = Conv2D(filters,
                            kernel_size=3,
                            strides=1,
+                           padding="same",
                            activation="relu",
                            name=rec_name)(var_x)
         return var_x
@@ -350,6 +579,10 @@ class S3fd(KSession):
     def conv_up(cls, inputs: Tensor, filters: int, idx: int) -> Tensor:
         """ Convolution up filter blocks with zero padding added.
 
+        The strided 3x3 convolution keeps its explicit symmetric padding, as Tensorflow's
+        ``same`` padding is asymmetric for even input sizes at stride 2 and would shift the
+        feature map.
+
         Parameters
         ----------
         inputs: tensor
@@ -381,7 +614,8 @@ class S3fd(KSession):
     def prepare_batch(self, batch: np.ndarray) -> np.ndarray:
         """ Prepare a batch for prediction.
 
-        Normalizes the feed images.
+        Normalizes the feed images. float32 input is normalized in place; anything else is
+        subtracted into a new float32 array.
 
         Parameters
         ----------
@@ -393,53 +627,80 @@ class S3fd(KSession):
         class:`numpy.ndarray`
             The normalized images for feeding to the model
         """
-        batch = batch - self.average_img
-        return batch
+        if batch.dtype == np.float32:
+            return np.subtract(batch, self.average_img, out=batch)
+        return np.subtract(batch, self.average_img, dtype="float32")
 
-    def finalize_predictions(self, bounding_boxes_scales: list[np.ndarray]) -> np.ndarray:
+    def finalize_predictions(self, bounding_boxes_scales: list[np.ndarray]) -> list[np.ndarray]:
         """ Process the output from the model to obtain faces
 
         Parameters
         ----------
         bounding_boxes_scales: list
             The output predictions from the S3FD model
+
+        Returns
+        -------
+        list
+            The (`faces`, 5) bounding box and score array for each image in the batch
         """
-        ret = []
-        batch_size = range(bounding_boxes_scales[0].shape[0])
-        for img in batch_size:
-            bboxlist = [scale[img:img+1] for scale in bounding_boxes_scales]
-            boxes = self._post_process(bboxlist)
-            finallist = self._nms(boxes, 0.5)
-            ret.append(finallist)
-        return np.array(ret, dtype="object")
-
-    def _post_process(self, bboxlist: list[np.ndarray]) -> np.ndarray:
-        """ Perform post processing on output
-            TODO: do this on the batch.
+        return [self._nms(boxes, 0.5) for boxes in self._post_process(bounding_boxes_scales)]
+
+    def _post_process(self, bboxlist: list[np.ndarray]) -> list[np.ndarray]:
+        """ Perform post processing on output.
+
+        Thresholding, prior generation and decoding run once per scale across the whole batch,
+        with the candidates split back out per image at the end.
+
+        Parameters
+        ----------
+        bboxlist: list
+            The output predictions from the S3FD model
+
+        Returns
+        -------
+        list
+            The (`candidates`, 5) bounding box and score arrays for each image in the batch
         """
-        retval = []
-        for i in range(len(bboxlist) // 2):
-            bboxlist[i * 2] = self.softmax(bboxlist[i * 2], axis=3)
+        batch_size = bboxlist[0].shape[0]
+        batch_indices = []
+        locations = []
+        priors = []
+        scores = []
         for i in range(len(bboxlist) // 2):
             ocls, oreg = bboxlist[i * 2], bboxlist[i * 2 + 1]
-            stride = 2 ** (i + 2)    # 4,8,16,32,64,128
-            poss = zip(*np.where(ocls[:, :, :, 1] > 0.05))
-            for _, hindex, windex in poss:
-                axc, ayc = stride / 2 + windex * stride, stride / 2 + hindex * stride
-                score = ocls[0, hindex, windex, 1]
-                if score >= self.confidence:
-                    loc = np.ascontiguousarray(oreg[0, hindex, windex, :]).reshape((1, 4))
-                    priors = np.array([[axc / 1.0, ayc / 1.0, stride * 4 / 1.0, stride * 4 / 1.0]])
-                    box = self.decode(loc, priors)
-                    x_1, y_1, x_2, y_2 = box[0] * 1.0
-                    retval.append([x_1, y_1, x_2, y_2, score])
-        return_numpy = np.array(retval) if len(retval) != 0 else np.zeros((1, 5))
-        return return_numpy
+            if ocls.shape[-1] == 2:
+                # Threshold the raw logits and only compute probabilities (via the sigmoid of
+                # the logit difference) for the sparse survivors. Skips exp on the full map
+                diff = ocls[..., 1] - ocls[..., 0]
+                bidx, hidx, widx = np.nonzero(diff >= self._logit_threshold)
+                logits = diff[bidx, hidx, widx].astype("float32", copy=False)
+                probs = 1.0 / (1.0 + np.exp(-logits))
+            else:
+                full = self.softmax(ocls, axis=3)[..., 1]
+                bidx, hidx, widx = np.nonzero(full >= self.confidence)
+                probs = full[bidx, hidx, widx].astype("float32", copy=False)
+            if bidx.size == 0:
+                continue
+            batch_indices.append(bidx)
+            locations.append(oreg[bidx, hidx, widx].astype("float32", copy=False))
+            priors.append(self._priors[i][hidx, widx])
+            scores.append(probs)
+        if not scores:
+            return [np.zeros((1, 5)) for _ in range(batch_size)]
+        bidx = np.concatenate(batch_indices)
+        order = np.argsort(bidx, kind="stable")
+        boxes = self.decode(np.concatenate(locations)[order], np.concatenate(priors)[order])
+        boxes = np.hstack([boxes, np.concatenate(scores)[order][:, None]])
+        splits = np.searchsorted(bidx[order], np.arange(1, batch_size))
+        return [img_boxes if img_boxes.size else np.zeros((1, 5))
+                for img_boxes in np.split(boxes, splits)]
 
     @staticmethod
     def softmax(inp, axis: int) -> np.ndarray:
         """Compute softmax values for each sets of scores in x."""
-        return np.exp(inp - logsumexp(inp, axis=axis, keepdims=True))
+        exps = np.exp(inp - inp.max(axis=axis, keepdims=True))
+        return exps / exps.sum(axis=axis, keepdims=True)
 
     @staticmethod
     def decode(location: np.ndarray, priors: np.ndarray) -> np.ndarray:
@@ -459,36 +720,54 @@ class S3fd(KSession):
             decoded bounding box predictions
         """
         variances = [0.1, 0.2]
-        boxes = np.concatenate((priors[:, :2] + location[:, :2] * variances[0] * priors[:, 2:],
-                                priors[:, 2:] * np.exp(location[:, 2:] * variances[1])), axis=1)
-        boxes[:, :2] -= boxes[:, 2:] / 2
-        boxes[:, 2:] += boxes[:, :2]
+        centers = priors[:, :2] + location[:, :2] * variances[0] * priors[:, 2:]
+        half_sizes = priors[:, 2:] * np.exp(location[:, 2:] * variances[1]) * 0.5
+        boxes = np.empty_like(location)
+        np.subtract(centers, half_sizes, out=boxes[:, :2])
+        np.add(centers, half_sizes, out=boxes[:, 2:])
         return boxes
 
-    @staticmethod
-    def _nms(boxes: np.ndarray, threshold: float) -> np.ndarray:
+    @classmethod
+    def _nms(cls, boxes: np.ndarray, threshold: float) -> np.ndarray:
         """ Perform Non-Maximum Suppression """
+        top_k = 200
+        if boxes.shape[0] > top_k:
+            # On crowded frames only the highest scoring candidates can survive suppression, so
+            # pre-select them with an O(N) partition rather than fully sorting every candidate
+            boxes = boxes[np.argpartition(-boxes[:, 4], top_k - 1)[:top_k]]
+        if _HAS_NUMBA:
+            return _nms_loop(boxes, threshold)
+        return cls._nms_vectorized(boxes, threshold)
+
+    @staticmethod
+    def _nms_vectorized(boxes: np.ndarray, threshold: float) -> np.ndarray:
+        """ Perform Non-Maximum Suppression with a pairwise IoU matrix.
+
+        Fallback for when Numba is not available to compile :func:`_nms_loop`. """
         retained_box_indices = []
 
+        scores = boxes[:, 4]
         areas = (boxes[:, 2] - boxes[:, 0] + 1) * (boxes[:, 3] - boxes[:, 1] + 1)
-        ranked_indices = boxes[:, 4].argsort()[::-1]
-        while ranked_indices.size > 0:
-            best_rest = ranked_indices[0], ranked_indices[1:]
-
-            max_of_xy = np.maximum(boxes[best_rest[0], :2], boxes[best_rest[1], :2])
-            min_of_xy = np.minimum(boxes[best_rest[0], 2:4], boxes[best_rest[1], 2:4])
-            width_height = np.maximum(0, min_of_xy - max_of_xy + 1)
-            intersection_areas = width_height[:, 0] * width_height[:, 1]
-            iou = intersection_areas / (areas[best_rest[0]] +
-                                        areas[best_rest[1]] - intersection_areas)
-
-            overlapping_boxes = (iou > threshold).nonzero()[0]
-            if len(overlapping_boxes) != 0:
-                overlap_set = ranked_indices[overlapping_boxes + 1]
-                vote = np.average(boxes[overlap_set, :4], axis=0, weights=boxes[overlap_set, 4])
-                boxes[best_rest[0], :4] = vote
-            retained_box_indices.append(best_rest[0])
-
-            non_overlapping_boxes = (iou <= threshold).nonzero()[0]
-            ranked_indices = ranked_indices[non_overlapping_boxes + 1]
+
+        # Pairwise IoU matrix in one vectorized shot. Suppression never alters the
+        # coordinates of unretained boxes, so it can be computed up front
+        max_of_xy = np.maximum(boxes[:, None, :2], boxes[None, :, :2])
+        min_of_xy = np.minimum(boxes[:, None, 2:4], boxes[None, :, 2:4])
+        width_height = np.maximum(0, min_of_xy - max_of_xy + 1)
+        intersection_areas = width_height[..., 0] * width_height[..., 1]
+        iou = intersection_areas / (areas[:, None] + areas[None, :] - intersection_areas)
+
+        alive = np.ones(boxes.shape[0], dtype=bool)
+        for best in scores.argsort()[::-1]:
+            if not alive[best]:
+                continue
+            alive[best] = False
+            overlapping_boxes = alive & (iou[best] > threshold)
+            if overlapping_boxes.any():
+                vote = np.average(boxes[overlapping_boxes, :4],
+                                  axis=0,
+                                  weights=scores[overlapping_boxes])
+                boxes[best, :4] = vote
+                alive[overlapping_boxes] = False
+            retained_box_indices.append(best)
         return boxes[retained_box_indices]
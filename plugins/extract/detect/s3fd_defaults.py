@@ -64,6 +64,19 @@ _DEFAULTS = {
         "gui_radio": False,
         "fixed": True,
     },
+    "precision": {
+        "default": "fp32",
+        "info": "The precision to run the model at.\n"
+                "\n\tfp32: Run the model at full 32-bit precision."
+                "\n\tfp16: Run the model computations at 16-bit precision. This halves the "
+                "memory bandwidth used and can significantly speed up inference on GPUs with "
+                "float16 support, at a negligible cost to detection accuracy. The numerically "
+                "sensitive normalization layers remain at full precision.",
+        "choices": ["fp32", "fp16"],
+        "datatype": str,
+        "group": "settings",
+        "gui_radio": True,
+    },
     "batch-size": {
         "default": 4,
         "info": "The batch size to use. To a point, higher batch sizes equal better performance, "